@@ -1,76 +1,192 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sys
-import os
-import subprocess
+# 다른 모듈을 불러오기 전에 표준 라이브러리를 gevent 협력형 구현으로 교체
+from gevent import monkey
+monkey.patch_all()
+
 import time
-import statistics
-from datetime import datetime
+import functools
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
 
-def install_package(package):
-    """패키지 자동 설치"""
-    print(f"📦 {package} 패키지를 설치하는 중...")
-    try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-        print(f"✅ {package} 설치 완료!")
-        return True
-    except subprocess.CalledProcessError:
-        print(f"❌ {package} 설치 실패!")
-        return False
+import numpy as np
+import orjson
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-def check_and_install_flask():
-    """Flask 패키지 확인 및 자동 설치"""
-    try:
-        import flask
-        return True
-    except ImportError:
-        print("Flask가 설치되어 있지 않습니다.")
-        if install_package("flask"):
-            try:
-                import flask
-                return True
-            except ImportError:
-                return False
-        return False
+from stats_kernels import median, welford
 
-if not check_and_install_flask():
-    print("❌ Flask 설치에 실패했습니다. 수동으로 'pip install flask'를 실행해주세요.")
-    sys.exit(1)
+_ORJSON_OPTION = orjson.OPT_SERIALIZE_NUMPY
 
-from flask import Flask, render_template_string, request, jsonify
+class OrjsonProvider(JSONProvider):
+    """orjson 기반 JSON 직렬화 (NumPy 배열을 그대로 직렬화)"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=_ORJSON_OPTION).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# 클라이언트별로 보관하는 최대 RTT 샘플 수 (오래된 샘플부터 제거, 2의 거듭제곱)
+MAX_SAMPLES = 1024
+_SAMPLE_MASK = MAX_SAMPLES - 1
+# /stats에 함께 보내는 최근 샘플 수와, 그 위치 계산에 재사용하는 오프셋
+RECENT_COUNT = 10
+_RECENT_IDX = np.arange(RECENT_COUNT)
+
+# RTT는 µs 단위 uint32로 양자화해 저장 (최대 약 71분, 그 이상은 상한값으로 고정)
+_RTT_MAX_US = np.iinfo(np.uint32).max
+
+class ClientBuf:
+    """클라이언트별 고정 크기 링 버퍼 (RTT와 타임스탬프를 별도 배열에 저장)"""
+    def __init__(self):
+        self.rtts = np.empty(MAX_SAMPLES, dtype=np.uint32)
+        self.ts = np.empty(MAX_SAMPLES, dtype=np.float64)
+        self.head = 0
+        self.n = 0
+    
+    def append(self, rtt, ts):
+        """샘플 추가 (가득 차면 가장 오래된 샘플을 덮어씀)"""
+        self.rtts[self.head] = min(max(int(round(rtt * 1000)), 0), _RTT_MAX_US)
+        self.ts[self.head] = ts
+        self.head = (self.head + 1) & _SAMPLE_MASK
+        self.n = min(self.n + 1, MAX_SAMPLES)
+    
+    def extend(self, rtts, ts):
+        """여러 샘플을 한 번에 추가 (rtts, ts는 같은 길이의 배열)"""
+        rtts, ts = rtts[-MAX_SAMPLES:], ts[-MAX_SAMPLES:]
+        idx = np.arange(self.head, self.head + len(rtts)) & _SAMPLE_MASK
+        self.rtts[idx] = np.clip(np.rint(rtts * 1000), 0, _RTT_MAX_US)
+        self.ts[idx] = ts
+        self.head = (self.head + len(rtts)) & _SAMPLE_MASK
+        self.n = min(self.n + len(rtts), MAX_SAMPLES)
+    
+    def window(self):
+        """보관 중인 모든 RTT (ms, 순서 무관)"""
+        # 가득 차기 전에는 앞쪽 n칸만, 가득 찬 뒤에는 버퍼 전체가 유효
+        return self.rtts[:self.n] / 1000.0
+    
+    def recent(self):
+        """최근 RECENT_COUNT개 샘플의 (RTT, 타임스탬프)를 시간순으로 반환"""
+        k = min(RECENT_COUNT, self.n)
+        idx = (self.head - k + _RECENT_IDX[:k]) & _SAMPLE_MASK
+        return self.rtts[idx] / 1000.0, self.ts[idx]
+
+@functools.lru_cache(maxsize=256)
+def _format_second(second):
+    """초 단위 타임스탬프를 HH:MM:SS로 변환 (연속된 /stats 호출 간 재사용)"""
+    return time.strftime("%H:%M:%S", time.localtime(second))
+
+def _new_agg():
+    return {"n": 0, "mean": 0.0, "M2": 0.0, "min": float("inf"), "max": float("-inf")}
 
 class RTTChecker:
     def __init__(self):
-        self.client_rtts = {}
+        self.client_rtts = defaultdict(ClientBuf)
+        # 클라이언트별 누적 통계 (Welford 알고리즘): n, mean, M2, min, max
+        self.client_agg = defaultdict(_new_agg)
+        # 같은 클라이언트의 동시 ping이 샘플을 잃지 않도록 클라이언트별 잠금
+        self.locks = defaultdict(threading.Lock)
+        # 클라이언트별 마지막 통계 계산 결과: client_id -> {"n", "stats", "body"(JSON bytes)}
+        self._stats_cache = {}
         
     def store_client_rtt(self, client_id, rtt):
         """클라이언트의 RTT 데이터 저장"""
-        if client_id not in self.client_rtts:
-            self.client_rtts[client_id] = []
-        self.client_rtts[client_id].append({
-            'rtt': rtt,
-            'timestamp': datetime.now()
-        })
+        with self.locks[client_id]:
+            self.client_rtts[client_id].append(rtt, time.time())
+            
+            agg = self.client_agg[client_id]
+            agg["n"] += 1
+            delta = rtt - agg["mean"]
+            agg["mean"] += delta / agg["n"]
+            agg["M2"] += (rtt - agg["mean"]) * delta
+            agg["min"] = min(agg["min"], rtt)
+            agg["max"] = max(agg["max"], rtt)
+    
+    def store_client_rtts(self, client_id, rtts, ts):
+        """클라이언트가 모아 보낸 RTT 샘플 배열을 한 번에 저장"""
+        n_b, mean_b, m2_b, min_b, max_b = welford(rtts)
+        with self.locks[client_id]:
+            self.client_rtts[client_id].extend(rtts, ts)
+            
+            # 기존 누적 통계와 배치 통계를 병합 (Chan의 병렬 Welford)
+            agg = self.client_agg[client_id]
+            n = agg["n"] + n_b
+            delta = mean_b - agg["mean"]
+            agg["M2"] += m2_b + delta * delta * agg["n"] * n_b / n
+            agg["mean"] += delta * n_b / n
+            agg["n"] = n
+            agg["min"] = min(agg["min"], float(min_b))
+            agg["max"] = max(agg["max"], float(max_b))
+    
+    def sample_count(self, client_id):
+        """클라이언트의 누적 RTT 샘플 수 (데이터가 없으면 0)"""
+        agg = self.client_agg.get(client_id)
+        return agg["n"] if agg else 0
     
     def get_client_stats(self, client_id):
-        """클라이언트의 RTT 통계 계산"""
-        if client_id not in self.client_rtts or not self.client_rtts[client_id]:
+        """클라이언트의 RTT 통계 조회"""
+        # defaultdict에 빈 항목이 생기지 않도록 인덱싱 전에 존재 여부 확인
+        if client_id not in self.client_rtts:
             return {"error": "RTT 데이터가 없습니다."}
         
-        rtts = [data['rtt'] for data in self.client_rtts[client_id]]
+        with self.locks[client_id]:
+            stats = dict(self._cached_stats(client_id)["stats"])
+        
+        # 캐시된 결과가 호출자의 수정에 영향받지 않도록 가변 항목도 복사
+        stats["recent_rtts"] = stats["recent_rtts"].copy()
+        stats["timestamps"] = list(stats["timestamps"])
+        return stats
+    
+    def get_client_stats_json(self, client_id):
+        """클라이언트의 (누적 샘플 수, 통계 JSON bytes) 조회 (데이터가 없으면 None)
+        
+        새 샘플이 저장될 때까지 한 번 직렬화한 bytes를 그대로 재사용
+        """
+        if client_id not in self.client_rtts:
+            return None
+        
+        with self.locks[client_id]:
+            entry = self._cached_stats(client_id)
+            if entry["body"] is None:
+                entry["body"] = orjson.dumps(entry["stats"], option=_ORJSON_OPTION)
+            return entry["n"], entry["body"]
+    
+    def _cached_stats(self, client_id):
+        """누적 샘플 수가 바뀌었을 때만 다시 계산한 캐시 항목 (잠금 안에서 호출)"""
+        # 클라이언트당 결과 하나만 보관
+        # (버퍼 길이는 MAX_SAMPLES에서 멈추므로 비교 기준으로 쓸 수 없음)
+        n = self.client_agg[client_id]["n"]
+        entry = self._stats_cache.get(client_id)
+        if entry is None or entry["n"] != n:
+            entry = {"n": n, "stats": self._compute_stats(client_id, n), "body": None}
+            self._stats_cache[client_id] = entry
+        return entry
+    
+    def _compute_stats(self, client_id, n):
+        """클라이언트의 RTT 통계 계산"""
+        agg = self.client_agg[client_id]
+        # 중간값만 보관 중인 최근 샘플로 계산하고, 나머지는 누적 통계를 그대로 사용
+        buf = self.client_rtts[client_id]
+        recent_rtts, recent_ts = buf.recent()
         
         return {
             "client_id": client_id,
-            "count": len(rtts),
-            "min": min(rtts),
-            "max": max(rtts),
-            "avg": statistics.mean(rtts),
-            "median": statistics.median(rtts),
-            "recent_rtts": rtts[-10:],  # 최근 10개 RTT
-            "timestamps": [data['timestamp'].strftime("%H:%M:%S") for data in self.client_rtts[client_id][-10:]]
+            "count": n,
+            "min": agg["min"],
+            "max": agg["max"],
+            "avg": agg["mean"],
+            "stddev": (agg["M2"] / n) ** 0.5,
+            "median": median(buf.window()),
+            "recent_rtts": recent_rtts,  # 최근 RECENT_COUNT개 RTT
+            "timestamps": [_format_second(second) for second in recent_ts.astype(np.int64).tolist()]
         }
 
 rtt_checker = RTTChecker()
@@ -226,6 +342,11 @@ HTML_TEMPLATE = """
         let rtts = [];
         let clientId = Math.random().toString(36).substr(2, 9);
         let totalMeasurements = 0;
+        // 서버 통계용으로 모아 두었다가 한 번에 전송할 샘플
+        let pendingSamples = [];
+        const BATCH_INTERVAL = 10000;
+        // 전송 실패로 쌓이는 샘플의 상한 (서버 보관 한도와 같음)
+        const MAX_PENDING_SAMPLES = 1024;
         
         function startContinuousRTT() {
             const interval = parseFloat(document.getElementById('interval').value) * 1000;
@@ -254,6 +375,7 @@ HTML_TEMPLATE = """
                     
                     if (response.ok) {
                         rtts.push(rtt);
+                        pendingSamples.push({rtt: rtt, ts: Date.now() / 1000});
                         totalMeasurements++;
                         
                         // 최근 100개의 RTT만 유지하여 메모리 관리
@@ -276,6 +398,52 @@ HTML_TEMPLATE = """
             }, interval);
         }
         
+        function requeueSamples(samples) {
+            // 전송에 실패한 샘플을 다음 전송에 다시 포함
+            pendingSamples = samples.concat(pendingSamples).slice(-MAX_PENDING_SAMPLES);
+        }
+        
+        async function flushSamples() {
+            if (pendingSamples.length === 0) return;
+            
+            const samples = pendingSamples;
+            pendingSamples = [];
+            
+            try {
+                const response = await fetch('/ping_batch', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        client_id: clientId,
+                        samples: samples
+                    })
+                });
+                
+                if (response.status >= 500) {
+                    requeueSamples(samples);
+                } else if (!response.ok) {
+                    // 4xx는 같은 배치를 다시 보내도 거부되므로 버림 (다음 배치까지 막지 않도록)
+                    console.error('RTT 샘플 전송 거부:', response.status);
+                }
+            } catch (error) {
+                console.error('RTT 샘플 전송 오류:', error);
+                requeueSamples(samples);
+            }
+        }
+        
+        // 페이지를 떠날 때 남은 샘플을 전송 (sendBeacon은 페이지가 닫혀도 전송이 완료됨)
+        window.addEventListener('pagehide', () => {
+            if (pendingSamples.length === 0) return;
+            
+            navigator.sendBeacon('/ping_batch', JSON.stringify({
+                client_id: clientId,
+                samples: pendingSamples
+            }));
+            pendingSamples = [];
+        });
+        
         function updateInterval() {
             // 간격이 변경되면 측정을 재시작
             startContinuousRTT();
@@ -284,6 +452,7 @@ HTML_TEMPLATE = """
         // 페이지 로드 시 자동 시작
         window.onload = function() {
             startContinuousRTT();
+            setInterval(flushSamples, BATCH_INTERVAL);
         };
 
         function updateRealTimeResults() {
@@ -352,37 +521,139 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# 템플릿 변수가 없으므로 Jinja 렌더링 없이 한 번만 인코딩해 재사용
+_INDEX_HTML = HTML_TEMPLATE.encode('utf-8')
+_INDEX_HEADERS = {'Cache-Control': 'public, max-age=3600'}
+
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return Response(_INDEX_HTML, mimetype='text/html', headers=_INDEX_HEADERS)
 
-@app.route('/ping', methods=['POST'])
-def ping():
-    """클라이언트의 ping 요청을 처리하고 RTT 데이터를 저장"""
-    data = request.json
+# 저장을 허용하는 RTT 상한 (ms)
+_MAX_RTT_MS = 600_000
+
+def _is_valid_rtt(value):
+    """JSON으로 받은 RTT가 0 이상의 유한한 ms 값인지 확인 (bool, NaN, inf 제외)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    # NaN과의 비교는 항상 거짓이므로 범위 검사로 NaN/inf도 걸러짐
+    return 0 <= value <= _MAX_RTT_MS
+
+# 클라이언트가 보낸 타임스탬프(epoch 초)의 허용 범위 (time.localtime으로 변환 가능한 값)
+_MIN_TS = 0
+_MAX_TS = 4_102_444_800  # 2100-01-01
+
+def _is_valid_ts(value):
+    """JSON으로 받은 타임스탬프가 허용 범위의 epoch 초인지 확인"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return _MIN_TS <= value < _MAX_TS
+
+@app.route('/ping_batch', methods=['POST'])
+def ping_batch():
+    """클라이언트가 모아 보낸 RTT 샘플({rtt, ts} 목록)을 한 번에 저장"""
+    # sendBeacon으로 보낸 본문은 text/plain이므로 Content-Type과 관계없이 JSON으로 해석
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "잘못된 JSON 요청입니다."}), 400
+    
     client_id = data.get('client_id')
-    client_timestamp = data.get('timestamp')
+    samples = data.get('samples')
     
-    if not client_id:
+    if not client_id or not isinstance(client_id, str):
         return jsonify({"error": "클라이언트 ID가 필요합니다."}), 400
+    if not samples or not isinstance(samples, list):
+        return jsonify({"error": "RTT 샘플이 필요합니다."}), 400
+    
+    # 잘못된 샘플이 하나라도 있으면 누적 통계가 오염되지 않도록 배치 전체를 거부
+    if not all(isinstance(sample, dict)
+               and _is_valid_rtt(sample.get('rtt'))
+               and _is_valid_ts(sample.get('ts'))
+               for sample in samples):
+        return jsonify({"error": "잘못된 RTT 샘플입니다."}), 400
     
-    # 서버에서의 처리 시간을 시뮬레이션 (실제로는 매우 작음)
-    server_time = time.time() * 1000  # ms로 변환
+    rtts = np.array([sample['rtt'] for sample in samples], dtype=np.float64)
+    ts = np.array([sample['ts'] for sample in samples], dtype=np.float64)
     
-    return jsonify({
-        "status": "pong",
-        "client_id": client_id,
-        "server_timestamp": server_time,
-        "client_timestamp": client_timestamp
-    })
+    rtt_checker.store_client_rtts(client_id, rtts, ts)
+    return '', 204
+
+# 재시작 후 이전 프로세스의 ETag와 겹치지 않도록 시작 시각을 접두어로 사용
+_ETAG_PREFIX = f"{int(time.time()):x}"
+
+def _stats_etag(n):
+    return f'W/"{_ETAG_PREFIX}-{n}"'
 
 @app.route('/stats/<client_id>')
 def get_client_stats(client_id):
-    """특정 클라이언트의 RTT 통계 조회"""
-    stats = rtt_checker.get_client_stats(client_id)
-    return jsonify(stats)
+    """특정 클라이언트의 RTT 통계 조회 (새 샘플이 없으면 304 또는 캐시된 응답)"""
+    n = rtt_checker.sample_count(client_id)
+    if not n:
+        return jsonify(rtt_checker.get_client_stats(client_id))
+    
+    etag = _stats_etag(n)
+    if request.headers.get('If-None-Match') == etag:
+        return '', 304, {'ETag': etag}
+    
+    count, body = rtt_checker.get_client_stats_json(client_id)
+    return Response(body, mimetype='application/json', headers={'ETag': _stats_etag(count)})
+
+def _wsgi_error(start_response, status, message):
+    """WSGI 앱에서 JSON 오류 응답 생성"""
+    body = orjson.dumps({"error": message})
+    start_response(status, [('Content-Type', 'application/json'),
+                            ('Content-Length', str(len(body)))])
+    return [body]
+
+# /ping 본문 크기 상한 (client_id와 rtt만 담기므로 1 KiB면 충분)
+_MAX_PING_BODY = 1024
+
+def ping_wsgi(environ, start_response):
+    """클라이언트의 ping 요청에 빈 응답으로 즉시 회신 (?record=1 이면 RTT 저장)
+    
+    RTT 측정에 Flask 디스패치 비용이 섞이지 않도록 순수 WSGI 앱으로 처리
+    """
+    # DispatcherMiddleware는 접두어로 연결하므로 /ping/... 같은 하위 경로는 거부
+    if environ.get('PATH_INFO'):
+        return _wsgi_error(start_response, '404 Not Found', "존재하지 않는 경로입니다.")
+    
+    if environ['REQUEST_METHOD'] != 'POST':
+        start_response('405 Method Not Allowed', [('Allow', 'POST'), ('Content-Length', '0')])
+        return []
+    
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return _wsgi_error(start_response, '400 Bad Request', "잘못된 요청 길이입니다.")
+    if length < 0:
+        return _wsgi_error(start_response, '400 Bad Request', "잘못된 요청 길이입니다.")
+    if length > _MAX_PING_BODY:
+        return _wsgi_error(start_response, '413 Request Entity Too Large', "요청 본문이 너무 큽니다.")
+    
+    try:
+        data = orjson.loads(environ['wsgi.input'].read(length))
+    except ValueError:
+        return _wsgi_error(start_response, '400 Bad Request', "잘못된 JSON 요청입니다.")
+    
+    client_id = data.get('client_id') if isinstance(data, dict) else None
+    if not client_id or not isinstance(client_id, str):
+        return _wsgi_error(start_response, '400 Bad Request', "클라이언트 ID가 필요합니다.")
+    
+    # 통계 기록은 선택 사항: 클라이언트가 직전에 측정한 RTT를 함께 보낸 경우만 저장
+    if parse_qs(environ.get('QUERY_STRING', '')).get('record'):
+        rtt = data.get('rtt')
+        if not _is_valid_rtt(rtt):
+            return _wsgi_error(start_response, '400 Bad Request', "RTT 값이 필요합니다.")
+        rtt_checker.store_client_rtt(client_id, float(rtt))
+    
+    start_response('204 No Content', [])
+    return []
+
+app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {'/ping': ping_wsgi})
 
 if __name__ == '__main__':
     print("🌐 RTT 체커 웹서버를 시작합니다...")
     print("📡 http://localhost:5000 에서 접속 가능합니다.")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # 그린렛 풀로 동시 /ping 요청을 하나의 프로세스에서 처리
+    server = WSGIServer(('0.0.0.0', 5000), app, spawn=Pool(1000))
+    server.serve_forever()
\ No newline at end of file
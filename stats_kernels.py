@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+# 컴파일 결과를 디스크에 캐시해 다음 실행부터 JIT 컴파일 시간을 생략
+os.environ.setdefault(
+    "NUMBA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".numba_cache"),
+)
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba가 없으면 동일한 코드를 NumPy로 실행
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# 시그니처를 명시해 import 시점에 컴파일 (첫 요청이 JIT 컴파일로 다른 요청을 막지 않도록)
+@njit("Tuple((intp, float64, float64, float64, float64))(float64[:])", cache=True)
+def welford(arr):
+    """한 번의 순회로 개수, 평균, M2, 최솟값, 최댓값 계산 (Welford 알고리즘)"""
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    mn = np.inf
+    mx = -np.inf
+    for x in arr:
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += (x - mean) * delta
+        if x < mn:
+            mn = x
+        if x > mx:
+            mx = x
+    return n, mean, m2, mn, mx
+
+@njit("float64(float64[:])", cache=True)
+def median(arr):
+    """introselect(np.partition) 기반 O(n) 중간값 계산"""
+    k = len(arr) // 2
+    part = np.partition(arr, k)
+    if len(arr) % 2:
+        return float(part[k])
+    # 짝수 개일 때 아래쪽 중간값은 k 앞쪽 구간의 최댓값
+    return float((part[:k].max() + part[k]) / 2)
@@ -0,0 +1,211 @@
+import numpy as np
+import pytest
+
+import rtt_checker
+from rtt_checker import MAX_SAMPLES, RECENT_COUNT, ClientBuf
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rtt_checker, "rtt_checker", rtt_checker.RTTChecker())
+    return rtt_checker.app.test_client()
+
+
+@pytest.mark.parametrize("rtt", [True, False, -3, -0.5, None, "12.5", [1.0]])
+def test_ping_record_rejects_invalid_rtt(client, rtt):
+    response = client.post("/ping?record=1", json={"client_id": "a", "rtt": rtt})
+    assert response.status_code == 400
+    assert rtt_checker.rtt_checker.sample_count("a") == 0
+
+
+def test_ping_record_stores_valid_rtt(client):
+    assert client.post("/ping?record=1", json={"client_id": "a", "rtt": 12.345}).status_code == 204
+    stats = client.get("/stats/a").json
+    assert stats["count"] == 1
+    assert stats["min"] == stats["max"] == stats["avg"] == 12.345
+
+
+@pytest.mark.parametrize("sample", [
+    {"rtt": None, "ts": 1.7e9},
+    {"rtt": "12.5", "ts": 1.7e9},
+    {"rtt": "nan", "ts": 1.7e9},
+    {"rtt": "inf", "ts": 1.7e9},
+    {"rtt": True, "ts": 1.7e9},
+    {"rtt": -1.0, "ts": 1.7e9},
+    {"rtt": 1e9, "ts": 1.7e9},
+    {"rtt": 12.5},
+    {"rtt": 12.5, "ts": None},
+    {"rtt": 12.5, "ts": 1e20},
+    {"rtt": 12.5, "ts": -1},
+    {"rtt": 12.5, "ts": False},
+    [12.5, 1.7e9],
+    12.5,
+])
+def test_ping_batch_rejects_invalid_sample(client, sample):
+    samples = [{"rtt": 10.0, "ts": 1.7e9}, sample]
+    response = client.post("/ping_batch", json={"client_id": "a", "samples": samples})
+    assert response.status_code == 400
+    # 배치 전체가 거부되어 앞쪽의 정상 샘플도 저장되지 않아야 함
+    assert rtt_checker.rtt_checker.sample_count("a") == 0
+
+
+def test_ping_batch_merges_with_single_samples(client):
+    samples = [{"rtt": rtt, "ts": 1.7e9 + i} for i, rtt in enumerate([1.0, 2.0, 3.0])]
+    assert client.post("/ping_batch", json={"client_id": "a", "samples": samples}).status_code == 204
+    assert client.post("/ping?record=1", json={"client_id": "a", "rtt": 6.0}).status_code == 204
+    
+    stats = client.get("/stats/a").json
+    assert stats["count"] == 4
+    assert stats["min"] == 1.0
+    assert stats["max"] == 6.0
+    assert stats["avg"] == pytest.approx(3.0)
+    assert stats["stddev"] == pytest.approx(1.8708286933869707)
+    assert stats["median"] == 2.5
+    assert stats["recent_rtts"] == [1.0, 2.0, 3.0, 6.0]
+
+
+def test_stats_recomputed_after_new_sample(client):
+    client.post("/ping?record=1", json={"client_id": "a", "rtt": 1.0})
+    first = client.get("/stats/a")
+    etag = first.headers["ETag"]
+    assert client.get("/stats/a", headers={"If-None-Match": etag}).status_code == 304
+    
+    client.post("/ping?record=1", json={"client_id": "a", "rtt": 3.0})
+    second = client.get("/stats/a", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    assert second.json["count"] == 2
+    assert second.json["recent_rtts"] == [1.0, 3.0]
+    # 캐시된 통계를 돌려받은 호출자가 수정해도 다음 조회에 영향이 없어야 함
+    stats = rtt_checker.rtt_checker.get_client_stats("a")
+    stats["count"] = 99
+    stats["recent_rtts"][0] = 999
+    stats["timestamps"].append("x")
+    fresh = rtt_checker.rtt_checker.get_client_stats("a")
+    assert fresh["count"] == 2
+    assert fresh["recent_rtts"].tolist() == [1.0, 3.0]
+    assert len(fresh["timestamps"]) == 2
+    assert client.get("/stats/a").json["recent_rtts"] == [1.0, 3.0]
+
+
+def test_stats_report_microsecond_values(client):
+    for rtt in (12.345, 3.3, 123.456):
+        client.post("/ping?record=1", json={"client_id": "a", "rtt": rtt})
+    stats = client.get("/stats/a").json
+    assert stats["median"] == 12.345
+    assert stats["recent_rtts"] == [12.345, 3.3, 123.456]
+
+
+def test_stats_json_bytes_reused_until_new_sample(client):
+    checker = rtt_checker.rtt_checker
+    assert checker.get_client_stats_json("a") is None
+    
+    client.post("/ping?record=1", json={"client_id": "a", "rtt": 1.0})
+    n, body = checker.get_client_stats_json("a")
+    assert n == 1
+    assert checker.get_client_stats_json("a")[1] is body
+    assert client.get("/stats/a").data == body
+    
+    client.post("/ping?record=1", json={"client_id": "a", "rtt": 2.0})
+    n, new_body = checker.get_client_stats_json("a")
+    assert n == 2
+    assert new_body != body
+
+
+def _assert_buf_matches(buf, samples):
+    """링 버퍼 내용이 최근 MAX_SAMPLES개 (rtt, ts) 목록과 같은지 확인"""
+    kept = samples[-MAX_SAMPLES:]
+    assert buf.n == len(kept)
+    np.testing.assert_allclose(np.sort(buf.window()), sorted(rtt for rtt, _ in kept))
+    recent_rtts, recent_ts = buf.recent()
+    np.testing.assert_allclose(recent_rtts, [rtt for rtt, _ in kept[-RECENT_COUNT:]])
+    np.testing.assert_array_equal(recent_ts, [ts for _, ts in kept[-RECENT_COUNT:]])
+
+
+def test_client_buf_partial_fill():
+    buf = ClientBuf()
+    samples = [(1.5, 100.0), (2.25, 101.0), (0.0, 102.0)]
+    for rtt, ts in samples:
+        buf.append(rtt, ts)
+    _assert_buf_matches(buf, samples)
+
+
+def test_client_buf_append_wraps_around():
+    buf = ClientBuf()
+    samples = [(i * 0.001, float(i)) for i in range(MAX_SAMPLES + 5)]
+    for rtt, ts in samples:
+        buf.append(rtt, ts)
+    assert buf.head == 5
+    _assert_buf_matches(buf, samples)
+
+
+def test_client_buf_extend_longer_than_capacity():
+    buf = ClientBuf()
+    buf.append(7.0, 1.0)
+    samples = [(i * 0.5, float(i)) for i in range(2 * MAX_SAMPLES + 3)]
+    buf.extend(np.array([rtt for rtt, _ in samples]), np.array([ts for _, ts in samples]))
+    assert buf.head == (1 + MAX_SAMPLES) % MAX_SAMPLES
+    _assert_buf_matches(buf, [(7.0, 1.0)] + samples)
+
+
+def test_client_buf_extend_across_boundary_matches_append():
+    rng = np.random.default_rng(0)
+    buf = ClientBuf()
+    samples = []
+    # 단건 추가와 배치 추가를 섞어 head가 여러 번 경계를 넘도록 함
+    for step in range(50):
+        k = int(rng.integers(1, 100))
+        batch = [(round(float(rtt), 3), float(len(samples) + i))
+                 for i, rtt in enumerate(rng.uniform(0, 500, k))]
+        if step % 2:
+            buf.extend(np.array([rtt for rtt, _ in batch]), np.array([ts for _, ts in batch]))
+        else:
+            for rtt, ts in batch:
+                buf.append(rtt, ts)
+        samples += batch
+        _assert_buf_matches(buf, samples)
+
+
+def test_client_buf_keeps_large_rtts_exact():
+    buf = ClientBuf()
+    samples = [(65.535, 1.0), (65.536, 2.0), (250.125, 3.0), (600000.0, 4.0)]
+    buf.append(*samples[0])
+    buf.extend(np.array([rtt for rtt, _ in samples[1:]]), np.array([ts for _, ts in samples[1:]]))
+    assert buf.recent()[0].tolist() == [rtt for rtt, _ in samples]
+
+
+def test_ping_batch_accepts_beacon_text_body(client):
+    body = '{"client_id": "a", "samples": [{"rtt": 4.5, "ts": 1700000000}]}'
+    response = client.post("/ping_batch", data=body, content_type="text/plain;charset=UTF-8")
+    assert response.status_code == 204
+    assert client.get("/stats/a").json["recent_rtts"] == [4.5]
+
+
+@pytest.mark.parametrize("method", ["GET", "PUT", "DELETE"])
+def test_ping_rejects_other_methods(client, method):
+    response = client.open("/ping", method=method)
+    assert response.status_code == 405
+    assert response.headers["Allow"] == "POST"
+
+
+@pytest.mark.parametrize("body", ["", "not json", "[1, 2]", '{"rtt": 1.0}', '{"client_id": 5}'])
+def test_ping_rejects_malformed_body(client, body):
+    response = client.post("/ping", data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_ping_rejects_oversized_body(client):
+    body = '{"client_id": "%s"}' % ("a" * rtt_checker._MAX_PING_BODY)
+    response = client.post("/ping", data=body, content_type="application/json")
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("path", ["/ping/", "/ping/anything"])
+def test_ping_subpaths_not_found(client, path):
+    assert client.post(path, json={"client_id": "a"}).status_code == 404
+
+
+def test_ping_batch_not_shadowed_by_ping_mount(client):
+    samples = [{"rtt": 1.0, "ts": 1700000000}]
+    assert client.post("/ping_batch", json={"client_id": "a", "samples": samples}).status_code == 204
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from stats_kernels import median, welford
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1024])
+def test_welford_matches_numpy(size):
+    arr = np.random.default_rng(size).uniform(0, 500, size)
+    n, mean, m2, mn, mx = welford(arr)
+    assert n == size
+    assert mean == pytest.approx(arr.mean())
+    assert m2 / n == pytest.approx(arr.var())
+    assert (mn, mx) == (arr.min(), arr.max())
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1024])
+def test_median_matches_numpy(size):
+    arr = np.random.default_rng(size).uniform(0, 500, size)
+    original = arr.copy()
+    assert median(arr) == pytest.approx(np.median(arr))
+    # 중간값 계산이 입력 배열을 재배열하지 않아야 함
+    np.testing.assert_array_equal(arr, original)
+
+
+@pytest.mark.parametrize("kernel", [median, welford])
+def test_kernels_compiled_at_import(kernel):
+    pytest.importorskip("numba")
+    # import 시점에 명시한 시그니처로 이미 컴파일되어 있고, 요청 중 새로 컴파일하지 않아야 함
+    assert len(kernel.signatures) == 1
+    with pytest.raises(TypeError):
+        kernel(np.ones(3, dtype=np.float32))